@@ -2,19 +2,47 @@
 """
 Subagent Tester MCP Server - Logs all environment and command line info
 """
+import atexit
+import logging
+import logging.handlers
 import os
+import queue
 import sys
 from pathlib import Path
-from loguru import logger
 from mcp.server import Server
 from mcp.server.stdio import stdio_server
 from mcp.types import Tool, TextContent
 
-# Configure loguru to log to file
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """Enqueue records as they are, leaving formatting to the listener's handlers.
+
+    The stock prepare() formats each record on the logging thread so it can be
+    pickled; this queue never leaves the process, so that work is skipped.
+    """
+
+    def prepare(self, record):
+        return record
+
+
+# Configure logging to file. The calling thread only enqueues records; a
+# QueueListener thread formats them and owns the file, so tool calls never
+# wait on formatting or disk.
 log_file = Path(__file__).with_name("subagent_tester_mcp_server.log")
-logger.remove()  # Remove default handler
-logger.add(log_file, rotation="10 MB", retention="7 days", level="DEBUG")
-logger.add(sys.stderr, level="INFO")  # Also log to stderr
+file_handler = logging.handlers.RotatingFileHandler(log_file, maxBytes=10 << 20, backupCount=7, encoding="utf-8")
+file_handler.setLevel(logging.DEBUG)
+file_handler.setFormatter(logging.Formatter("%(asctime)s | %(levelname)-8s | %(funcName)s:%(lineno)d - %(message)s"))
+stderr_handler = logging.StreamHandler(sys.stderr)
+stderr_handler.setLevel(logging.WARNING)  # Only problems go to stderr
+
+log_queue = queue.SimpleQueue()
+listener = logging.handlers.QueueListener(log_queue, file_handler, stderr_handler, respect_handler_level=True)
+listener.start()
+atexit.register(listener.stop)
+
+logger = logging.getLogger("subagent-tester")
+logger.setLevel(logging.DEBUG)
+logger.addHandler(DeferredQueueHandler(log_queue))
 
 # Log startup information
 logger.info("=" * 80)
@@ -22,16 +50,16 @@ logger.info("SUBAGENT TESTER MCP SERVER STARTED")
 logger.info("=" * 80)
 
 logger.debug("COMMAND LINE:")
-logger.debug(f"  argv: {sys.argv}")
-logger.debug(f"  executable: {sys.executable}")
-logger.debug(f"  cwd: {os.getcwd()}")
+logger.debug("  argv: %s", sys.argv)
+logger.debug("  executable: %s", sys.executable)
+logger.debug("  cwd: %s", os.getcwd())
 
 logger.debug("KEY ENVIRONMENT VARIABLES:")
 for key in ['DYLD_INSERT_LIBRARIES', 'CURSOR_REDIRECT_SOURCE', 'CURSOR_REDIRECT_TARGET']:
     value = os.environ.get(key, '(not set)')
-    logger.debug(f"  {key}={value}")
+    logger.debug("  %s=%s", key, value)
 
-logger.info(f"🔍 Subagent Tester MCP server started, logged to {log_file}")
+logger.info("🔍 Subagent Tester MCP server started, logged to %s", log_file)
 
 # Now run a minimal MCP server
 app = Server("subagent-tester-mcp")
@@ -53,7 +81,7 @@ async def list_tools() -> list[Tool]:
 @app.call_tool()
 async def call_tool(name: str, arguments: dict) -> list[TextContent]:
     if name == "get-test-phrase":
-        logger.info("get-test-phrase tool called")
+        logger.debug("get-test-phrase tool called")
         return [TextContent(type="text", text="The kiwis sit upon the mountaintops")]
 
     raise ValueError(f"Unknown tool: {name}")
@@ -68,7 +96,7 @@ async def main():
                 app.create_initialization_options()
             )
     except Exception as e:
-        logger.exception(f"MCP server crashed: {e}")
+        logger.exception("MCP server crashed: %s", e)
         raise
 
 if __name__ == "__main__":
@@ -79,7 +107,7 @@ if __name__ == "__main__":
     except KeyboardInterrupt:
         logger.info("MCP server stopped by user")
     except Exception as e:
-        logger.exception(f"Fatal error: {e}")
+        logger.exception("Fatal error: %s", e)
         sys.exit(1)
 
 
@@ -5,6 +5,4 @@ cursor-subagent - Transparent wrapper for cursor-agent with isolated agent confi
 
 __version__ = "0.3.0"
 
-from .server import main
-
-__all__ = ["main", "__version__"]
+__all__ = ["__version__"]
@@ -1,7 +1,9 @@
 #!/usr/bin/env python3
 """Entry point for running cursor-subagent as a module."""
 
+import sys
+
 from .cli import main
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
@@ -3,38 +3,85 @@
 cursor-subagent CLI - Transparent wrapper for cursor-agent with isolated agent configurations.
 """
 
+import os
+import re
 import sys
-import subprocess
-import argparse
+from pathlib import Path
 
 from . import __version__
-from .server import run_mcp_server
 from .core import (
     list_agents,
     get_agent_info,
     run_with_agent,
-    get_cursor_agent_path,
-    get_dylib_path
+    preflight,
+    PreflightError,
+    get_cursor_agent_path
 )
 
 
-def get_cursor_agent_help() -> str:
-    """Get the original cursor-agent help output."""
+# Cached cursor-agent --help / --version output
+CACHE_DIR = Path.home() / ".cache" / "cursor-subagent"
+
+# Commands handled by cursor-subagent itself when given as the first argument
+SUBAGENT_COMMANDS = {"list-agents", "mcp-server"}
+
+# Help lines that cursor-subagent's own entries are inserted in front of
+_RESUME_RE = re.compile(r'^(?P<line>.*--resume.*)$', re.M)
+_HELP_RE = re.compile(r'^(?P<line>[ \t]*help .*)$', re.M)
+
+
+def get_cursor_agent_output(flag: str) -> str:
+    """
+    Get cursor-agent's output for a single informational flag (e.g. --help).
+
+    The output is cached under CACHE_DIR, keyed on the cursor-agent binary's
+    mtime, so cursor-agent is only run again after it has been updated.
+    """
+    import subprocess
+
     cursor_agent = get_cursor_agent_path()
-    if not cursor_agent.exists():
+    try:
+        mtime_ns = cursor_agent.stat().st_mtime_ns
+    except OSError:
         return ""
 
+    name = flag.lstrip("-")
+    cache_file = CACHE_DIR / f"{name}-{mtime_ns}.txt"
+    try:
+        return cache_file.read_text()
+    except OSError:
+        pass
+
     try:
         result = subprocess.run(
-            [str(cursor_agent), "--help"],
+            [str(cursor_agent), flag],
             capture_output=True,
             text=True,
             check=False
         )
-        return result.stdout
     except Exception:
         return ""
 
+    if result.returncode == 0:
+        # Write atomically and drop entries for older cursor-agent builds
+        try:
+            CACHE_DIR.mkdir(parents=True, exist_ok=True)
+            tmp_file = cache_file.with_name(f"{cache_file.name}.{os.getpid()}.tmp")
+            tmp_file.write_text(result.stdout)
+            os.replace(tmp_file, cache_file)
+            for stale in CACHE_DIR.glob(f"{name}-*.txt"):
+                if stale != cache_file:
+                    stale.unlink(missing_ok=True)
+        except OSError:
+            pass
+
+    return result.stdout
+
+
+def get_cursor_agent_help() -> str:
+    """Get the original cursor-agent help output."""
+    return get_cursor_agent_output("--help")
+
 
 def inject_cursor_subagent_help(original_help: str) -> str:
     """
@@ -43,32 +90,13 @@ def inject_cursor_subagent_help(original_help: str) -> str:
     if not original_help:
         return "cursor-agent not found. Install Cursor to use cursor-subagent."
 
-    lines = original_help.split('\n')
-    output = []
-    i = 0
-
-    while i < len(lines):
-        line = lines[i]
-
-        # Prepend -a/--agent option *before* --resume
-        if '--resume' in line:
-            output.append('  -a, --agent <name>           Use a specific agent configuration')
-            output.append(line)
-            i += 1
-            continue
-
-        # Prepend list-agents before the help command
-        if line.strip().startswith('help '):
-            output.append('  list-agents                  List all available subagent configurations')
-            output.append(line)
-            i += 1
-            continue
-
-        output.append(line)
-        i += 1
-
-
-    return '\n'.join(output)
+    # Prepend -a/--agent option *before* --resume, and list-agents before the help command
+    enhanced = _RESUME_RE.sub(
+        r'  -a, --agent <name>           Use a specific agent configuration\n\g<line>', original_help
+    )
+    return _HELP_RE.sub(
+        r'  list-agents                  List all available subagent configurations\n\g<line>', enhanced
+    )
 
 
 def cmd_list_agents():
@@ -97,9 +125,49 @@ def cmd_list_agents():
     return 0
 
 
+def is_subagent_option(arg: str) -> bool:
+    """
+    Check whether argparse could take an argument as one of cursor-subagent's options.
+
+    Errs on the side of True: long options may be abbreviated and short ones
+    may carry their value (-adesigner), so both are matched by prefix.
+    """
+    if arg.startswith("--"):
+        option = arg.split("=", 1)[0]
+        return len(option) > 2 and any(o.startswith(option) for o in ("--agent", "--version", "--help"))
+    return arg.startswith(("-a", "-v", "-h"))
+
+
+def exec_cursor_agent(cursor_agent: Path, args: list[str]) -> int:
+    """Replace this process with cursor-agent; only returns (with 1) if the exec fails."""
+    try:
+        os.execv(cursor_agent, [str(cursor_agent), *args])
+    except OSError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+
+
+def forward_to_cursor_agent(args: list[str]) -> int:
+    """Replace this process with cursor-agent, passing the arguments through unchanged."""
+    try:
+        cursor_agent, _ = preflight(require_dylib=False)
+    except PreflightError as e:
+        print(f"❌ {e}", file=sys.stderr)
+        return 1
+
+    return exec_cursor_agent(cursor_agent, args)
+
+
 def main():
     """Main CLI entry point - wrapper around cursor-agent."""
 
+    # Fast path: nothing for cursor-subagent to handle, so skip argparse and exec cursor-agent
+    argv = sys.argv[1:]
+    if not (argv and argv[0] in SUBAGENT_COMMANDS) and not any(map(is_subagent_option, argv)):
+        return forward_to_cursor_agent(argv)
+
+    import argparse
+
     # Create parser for cursor-subagent specific options
     parser = argparse.ArgumentParser(
         prog='cursor-subagent',
@@ -126,7 +194,7 @@ def main():
 
     if args.version:
         print(f"cursor-subagent {__version__}")
-        print(f"cursor-agent {subprocess.run(['cursor-agent', '--version'], capture_output=True, text=True).stdout.strip()}")
+        print(f"cursor-agent {get_cursor_agent_output('--version').strip() or 'not found'}")
         return 0
 
     # Check for list-agents command
@@ -135,6 +203,8 @@ def main():
 
     # Check for mcp command
     if remaining and remaining[0] == 'mcp-server':
+        from .server import run_mcp_server
+
         try:
             run_mcp_server()
             return 0
@@ -142,38 +212,21 @@ def main():
             print("\n👋 MCP server stopped", file=sys.stderr)
             return 0
 
-    # Check dylib exists if using an agent
-    if args.agent:
-        dylib_path = get_dylib_path()
-        if not dylib_path.exists():
-            print(f"❌ Dylib not found at {dylib_path}", file=sys.stderr)
-            print("This usually means cursor-subagent wasn't installed correctly.", file=sys.stderr)
-            print("Try reinstalling: uvx --reinstall cursor-subagent@latest", file=sys.stderr)
-            return 1
-
-    # Check cursor-agent exists
-    cursor_agent = get_cursor_agent_path()
-    if not cursor_agent.exists():
-        print(f"❌ cursor-agent not found at {cursor_agent}", file=sys.stderr)
-        print("Install Cursor to use cursor-subagent", file=sys.stderr)
+    # Check cursor-agent (and the dylib, if using an agent) exists
+    try:
+        cursor_agent, dylib_path = preflight(require_dylib=bool(args.agent))
+    except PreflightError as e:
+        print(f"❌ {e}", file=sys.stderr)
         return 1
 
-    # Run with agent or forward to cursor-agent
+    # Run with agent or forward to cursor-agent; either way cursor-agent replaces this process
     if args.agent:
-        return run_with_agent(args.agent, remaining)
+        return run_with_agent(
+            args.agent, remaining, cursor_agent=cursor_agent, dylib_path=dylib_path, replace_process=True
+        )
     else:
         # Forward all remaining args to cursor-agent
-        try:
-            result = subprocess.run(
-                [str(cursor_agent)] + remaining,
-                check=False
-            )
-            return result.returncode
-        except KeyboardInterrupt:
-            return 130
-        except Exception as e:
-            print(f"Error: {e}", file=sys.stderr)
-            return 1
+        return exec_cursor_agent(cursor_agent, remaining)
 
 
 if __name__ == "__main__":
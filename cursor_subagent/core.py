@@ -4,15 +4,41 @@ Core functionality for cursor-subagent - shared between CLI and MCP server.
 """
 
 import os
-import subprocess
 import sys
+from functools import lru_cache
 from pathlib import Path
-from typing import Optional
+from types import MappingProxyType
+from typing import Mapping, Optional
 
 
+# Home and project directories, resolved once per process; see refresh()
+_HOME = Path.home()
+_CWD = Path.cwd()
+_CURSOR_AGENT = _HOME / ".local" / "bin" / "cursor-agent"
+_AGENTS_DIR = _CWD / ".cursor" / "agents"
+
 # Default dylib location
-DEFAULT_DYLIB_DIR = Path.home() / ".local" / "share" / "cursor-subagent"
+DEFAULT_DYLIB_DIR = _HOME / ".local" / "share" / "cursor-subagent"
 DEFAULT_DYLIB_PATH = DEFAULT_DYLIB_DIR / "libcursor_redirect.dylib"
+PACKAGE_DYLIB_PATH = Path(__file__).parent / "libcursor_redirect.dylib"
+
+# Longest agent description read from description.txt
+MAX_DESCRIPTION_LENGTH = 512
+
+# Files in an agent directory that its info is built from
+_AGENT_INFO_FILES = (".cursorrules", "rules", "mcp.json", "description.txt")
+
+# Environment snapshot that agent environments are layered on
+_BASE_ENV = tuple(os.environ.items())
+
+
+def refresh() -> None:
+    """Re-resolve the home and project directories, e.g. after os.chdir()."""
+    global _HOME, _CWD, _CURSOR_AGENT, _AGENTS_DIR
+    _HOME = Path.home()
+    _CWD = Path.cwd()
+    _CURSOR_AGENT = _HOME / ".local" / "bin" / "cursor-agent"
+    _AGENTS_DIR = _CWD / ".cursor" / "agents"
 
 
 def get_dylib_path() -> Path:
@@ -26,14 +52,13 @@ def get_dylib_path() -> Path:
         return DEFAULT_DYLIB_PATH
 
     # Check local directory (for development)
-    local_dylib = Path.cwd() / "libcursor_redirect.dylib"
+    local_dylib = _CWD / "libcursor_redirect.dylib"
     if local_dylib.exists():
         return local_dylib
 
     # Check in package directory (for installed package)
-    package_dylib = Path(__file__).parent / "libcursor_redirect.dylib"
-    if package_dylib.exists():
-        return package_dylib
+    if PACKAGE_DYLIB_PATH.exists():
+        return PACKAGE_DYLIB_PATH
 
     # Default to standard location
     return DEFAULT_DYLIB_PATH
@@ -41,56 +66,250 @@ def get_dylib_path() -> Path:
 
 def get_project_root() -> Path:
     """Get the project root directory."""
-    return Path.cwd()
+    return _CWD
 
 
 def get_agents_dir() -> Path:
     """Get the agents directory."""
-    return get_project_root() / ".cursor" / "agents"
+    return _AGENTS_DIR
 
 
 def get_cursor_agent_path() -> Path:
     """Get the path to cursor-agent executable."""
-    return Path.home() / ".local" / "bin" / "cursor-agent"
+    return _CURSOR_AGENT
 
 
-def list_agents() -> list[str]:
-    """List all available agents."""
-    agents_dir = get_agents_dir()
-    if not agents_dir.exists():
+class PreflightError(Exception):
+    """Raised when cursor-agent or the dylib needed to run it is missing."""
+
+
+def preflight(require_dylib: bool) -> tuple[Path, Optional[Path]]:
+    """
+    Check that everything needed to launch cursor-agent is installed.
+
+    Args:
+        require_dylib: Whether the redirect dylib is needed (i.e. an agent is used)
+
+    Returns:
+        Tuple of (cursor-agent path, dylib path or None if not required)
+
+    Raises:
+        PreflightError: With a user-facing message if something is missing
+    """
+    dylib_path = None
+    if require_dylib:
+        dylib_path = get_dylib_path()
+        if not dylib_path.exists():
+            raise PreflightError(
+                f"Dylib not found at {dylib_path}\n"
+                "This usually means cursor-subagent wasn't installed correctly.\n"
+                "Try reinstalling: uvx --reinstall cursor-subagent@latest"
+            )
+
+    cursor_agent = get_cursor_agent_path()
+    if not cursor_agent.exists():
+        raise PreflightError(
+            f"cursor-agent not found at {cursor_agent}\n"
+            "Install Cursor to use cursor-subagent"
+        )
+
+    return cursor_agent, dylib_path
+
+
+def spawn(cmd: list[str], env: Mapping[str, str], cwd: Optional[str] = None) -> int:
+    """
+    Run a command to completion and return its exit code.
+
+    Uses posix_spawn so the launch cost doesn't grow with the size of the
+    calling process (subprocess forks first). posix_spawn has no portable
+    chdir action, so a cwd other than the current one goes through subprocess.
+
+    Args:
+        cmd: Command to run; cmd[0] must be a path to the executable
+        env: Environment for the child
+        cwd: Optional working directory for the child
+
+    Returns:
+        Exit code of the command (negative signal number if it was killed)
+    """
+    if not hasattr(os, "posix_spawn") or (cwd is not None and os.path.abspath(cwd) != os.getcwd()):
+        import subprocess
+
+        return subprocess.run(cmd, env=env, cwd=cwd).returncode
+
+    pid = os.posix_spawn(cmd[0], cmd, env)
+    try:
+        _, status = os.waitpid(pid, 0)
+    except KeyboardInterrupt:
+        # The child shares our process group and got the SIGINT too; reap it
+        os.waitpid(pid, 0)
+        raise
+    return os.waitstatus_to_exitcode(status)
+
+
+def _scan_agents(agents_dir: str) -> list[os.DirEntry]:
+    """Return directory entries for every agent (a directory with a .cursorrules file)."""
+    with os.scandir(agents_dir) as it:
+        return [
+            e for e in it
+            if e.is_dir() and os.path.exists(os.path.join(e.path, ".cursorrules"))
+        ]
+
+
+def scan_agents() -> list[os.DirEntry]:
+    """List all available agents as directory entries, for callers that need more than names."""
+    try:
+        return _scan_agents(str(get_agents_dir()))
+    except FileNotFoundError:
         return []
 
-    return [
-        d.name for d in agents_dir.iterdir()
-        if d.is_dir() and (d / ".cursorrules").exists()
-    ]
 
+def list_agents() -> list[str]:
+    """List all available agents."""
+    # Not cached: a .cursorrules added to an existing directory doesn't touch the
+    # agents directory's mtime, and the scan is what a cache check would cost anyway
+    return [e.name for e in scan_agents()]
 
-def get_agent_info(name: str) -> Optional[dict]:
-    """Get information about a specific agent."""
-    agent_path = get_agents_dir() / name
-    if not agent_path.exists():
-        return None
 
+def _has_entries(path: str) -> bool:
+    """Check whether a directory exists and is non-empty."""
+    try:
+        with os.scandir(path) as it:
+            return next(it, None) is not None
+    except (FileNotFoundError, NotADirectoryError):
+        return False
+
+
+def _info_file_mtimes(agent_dir: str) -> tuple[Optional[int], ...]:
+    """Modification times of the files agent info is built from (None if missing)."""
+    mtimes = []
+    for name in _AGENT_INFO_FILES:
+        try:
+            mtimes.append(os.stat(os.path.join(agent_dir, name)).st_mtime_ns)
+        except (FileNotFoundError, NotADirectoryError):
+            mtimes.append(None)
+    return tuple(mtimes)
+
+
+@lru_cache(maxsize=32)
+def _agent_info_cached(name: str, agent_dir: str, file_mtimes: tuple[Optional[int], ...]) -> dict:
+    """Collect agent information; cached on the agent's path and its info files' mtimes."""
     info = {
         "name": name,
-        "path": str(agent_path),
-        "has_rules": (agent_path / ".cursorrules").exists() or ((agent_path / "rules").is_dir() and len(list((agent_path / "rules").iterdir())) > 0),
-        "has_mcp_config": (agent_path / "mcp.json").exists(),
+        "path": agent_dir,
+        "has_rules": os.path.exists(os.path.join(agent_dir, ".cursorrules")) or _has_entries(os.path.join(agent_dir, "rules")),
+        "has_mcp_config": os.path.exists(os.path.join(agent_dir, "mcp.json")),
     }
 
-    # Read description if available
-    desc_file = agent_path / "description.txt"
-    if desc_file.exists():
-        info["description"] = desc_file.read_text().strip()
+    # Read description if available; only its start is ever shown
+    try:
+        with open(os.path.join(agent_dir, "description.txt"), encoding="utf-8") as f:
+            info["description"] = f.read(MAX_DESCRIPTION_LENGTH).strip()
+    except OSError:
+        pass
 
     return info
 
 
+def get_agent_info(name: str, entry: Optional[os.DirEntry] = None) -> Optional[dict]:
+    """
+    Get information about a specific agent.
+
+    Args:
+        name: Agent name
+        entry: Optional directory entry for the agent, as returned by scan_agents(),
+            to avoid resolving the path again
+
+    Returns:
+        Agent information, or None if the agent doesn't exist
+    """
+    agent_dir = entry.path if entry is not None else os.path.join(get_agents_dir(), name)
+    if entry is None and not os.path.exists(agent_dir):
+        return None
+
+    # Hand out a copy so callers can't mutate the cached entry
+    return dict(_agent_info_cached(name, agent_dir, _info_file_mtimes(agent_dir)))
+
+
+@lru_cache(maxsize=32)
+def agent_env(agent_path: str, dylib_path: str, source_path: str) -> Mapping[str, str]:
+    """
+    Build the environment that makes cursor-agent load an agent's configuration.
+
+    Cached per agent; the result is read-only and shared between calls.
+    """
+    env = dict(_BASE_ENV)
+    env["DYLD_INSERT_LIBRARIES"] = dylib_path
+    env["CURSOR_REDIRECT_TARGET"] = agent_path
+    env["CURSOR_REDIRECT_SOURCE"] = source_path
+    return MappingProxyType(env)
+
+
+def _require_agent(agent_name: str, agents_dir: str) -> str:
+    """Return the agent's directory, raising PreflightError if it doesn't exist."""
+    agent_path = os.path.join(agents_dir, agent_name)
+    if not os.path.exists(agent_path):
+        raise PreflightError(
+            f"Agent '{agent_name}' does not exist\n"
+            f"Available agents: {', '.join(list_agents())}"
+        )
+    return agent_path
+
+
+@lru_cache(maxsize=32)
+def _agent_template_cached(
+    agent_name: str,
+    agents_dir: str,
+    agents_mtime_ns: int,
+    cursor_agent: Path,
+    dylib_path: Path
+) -> tuple[tuple[str, ...], Mapping[str, str]]:
+    """Resolve an agent's launch template; cached until the agents directory or installation changes."""
+    agent_path = _require_agent(agent_name, agents_dir)
+    env = agent_env(agent_path, str(dylib_path), str(get_project_root() / ".cursor"))
+    return (str(cursor_agent),), env
+
+
+def _agent_template(
+    agent_name: str,
+    cursor_agent: Optional[Path] = None,
+    dylib_path: Optional[Path] = None
+) -> tuple[tuple[str, ...], Mapping[str, str]]:
+    """
+    Get the argv prefix and environment for launching cursor-agent as an agent.
+
+    The template is resolved once per agent and installation, and reused until
+    the agents directory changes; the installation itself is checked on every
+    call unless the caller passes already-checked paths.
+
+    Raises:
+        PreflightError: If the agent or the installation is missing
+    """
+    agents_dir = str(get_agents_dir())
+
+    # Check installation unless the caller already did. Never cached: the dylib
+    # can be removed or CURSOR_SUBAGENT_DYLIB_PATH changed without the agents
+    # directory changing. A missing agent is still reported first.
+    if cursor_agent is None or dylib_path is None:
+        _require_agent(agent_name, agents_dir)
+        cursor_agent, dylib_path = preflight(require_dylib=True)
+        assert dylib_path is not None
+
+    try:
+        mtime_ns = os.stat(agents_dir).st_mtime_ns
+    except FileNotFoundError:
+        mtime_ns = 0
+    return _agent_template_cached(agent_name, agents_dir, mtime_ns, cursor_agent, dylib_path)
+
+
 def run_with_agent(
     agent_name: str,
     cursor_agent_args: list[str],
-    workspace_path: Optional[str] = None
+    workspace_path: Optional[str] = None,
+    *,
+    cursor_agent: Optional[Path] = None,
+    dylib_path: Optional[Path] = None,
+    replace_process: bool = False
 ) -> int:
     """
     Run cursor-agent with agent configuration injected via dylib.
@@ -99,50 +318,33 @@ def run_with_agent(
         agent_name: Agent name
         cursor_agent_args: Arguments to pass to cursor-agent
         workspace_path: Optional workspace path
+        cursor_agent: cursor-agent path already checked by preflight()
+        dylib_path: Dylib path already checked by preflight()
+        replace_process: Exec cursor-agent in place of this process instead of
+            waiting for it as a child; only returns if that fails
 
     Returns:
         Exit code from cursor-agent
     """
-    agent_path = get_agents_dir() / agent_name
-    if not agent_path.exists():
-        print(f"Error: Agent '{agent_name}' does not exist", file=sys.stderr)
-        print(f"Available agents: {', '.join(list_agents())}", file=sys.stderr)
+    try:
+        argv, env = _agent_template(agent_name, cursor_agent, dylib_path)
+    except PreflightError as e:
+        print(f"Error: {e}", file=sys.stderr)
         return 1
 
     # Determine workspace path
     if workspace_path is None:
         workspace_path = str(get_project_root())
 
-    # Get dylib path
-    dylib_path = get_dylib_path()
-    if not dylib_path.exists():
-        print(f"Error: Dylib not found at {dylib_path}", file=sys.stderr)
-        print("Please check your installation method against the README", file=sys.stderr)
-        return 1
-
-    # Set up environment for dylib redirection
-    env = os.environ.copy()
-    env["DYLD_INSERT_LIBRARIES"] = str(dylib_path)
-    env["CURSOR_REDIRECT_TARGET"] = str(agent_path)
-    env["CURSOR_REDIRECT_SOURCE"] = str(get_project_root() / ".cursor")
-
-    # Get cursor-agent path
-    cursor_agent = get_cursor_agent_path()
-    if not cursor_agent.exists():
-        print(f"Error: cursor-agent not found at {cursor_agent}", file=sys.stderr)
-        return 1
-
     # Build command
-    cmd = [str(cursor_agent)] + cursor_agent_args
+    cmd = [*argv, *cursor_agent_args]
 
     # Execute cursor-agent with the agent configuration
     try:
-        result = subprocess.run(
-            cmd,
-            env=env,
-            cwd=workspace_path
-        )
-        return result.returncode
+        if replace_process:
+            os.chdir(workspace_path)
+            os.execve(cmd[0], cmd, env)
+        return spawn(cmd, env, cwd=workspace_path)
     except Exception as e:
         print(f"Error executing cursor-agent: {e}", file=sys.stderr)
         return 1
@@ -5,26 +5,89 @@ MCP Server for cursor-subagent - provides tools for AI agents.
 Entry point: cursor-subagent mcp-server
 """
 
-import json
 import os
-import subprocess
+import json
+import signal
 import asyncio
-from mcp.server import Server
-from mcp.server.stdio import stdio_server
+import contextlib
+from asyncio.subprocess import PIPE, Process
+from collections import deque
 from mcp.types import Tool, TextContent
 
 from .core import (
-    list_agents,
+    scan_agents,
     get_agent_info,
     get_project_root
 )
 
 
-# Create the MCP server
-app = Server("cursor-subagent")
+# Agent output is streamed and only its tail is kept, so memory stays bounded
+OUTPUT_CHUNK_SIZE = 64 * 1024
+OUTPUT_MAX_BYTES = 4 << 20
+SPAWN_AGENT_TIMEOUT = 300
+# Seconds to wait for a stopped agent's process group to exit after each signal
+SPAWN_AGENT_STOP_TIMEOUT = 5
+# Seconds between checks for the agent having exited
+SPAWN_AGENT_POLL_INTERVAL = 0.1
+# Seconds to let output drain after the agent exits before stopping what it left behind
+SPAWN_AGENT_DRAIN_TIMEOUT = 1
+
+# cursor-agent flags for non-interactive spawn-agent runs
+SPAWN_AGENT_FLAGS = ("-p", "--output-format=text", "--force", "--approve-mcps")
+
+
+async def read_tail(stream: asyncio.StreamReader) -> str:
+    """Drain a subprocess stream, keeping at most the last OUTPUT_MAX_BYTES bytes."""
+    ring: deque[bytes] = deque()
+    size = 0
+    while chunk := await stream.read(OUTPUT_CHUNK_SIZE):
+        ring.append(chunk)
+        size += len(chunk)
+        while size - len(ring[0]) >= OUTPUT_MAX_BYTES:
+            size -= len(ring.popleft())
+    return b"".join(ring)[-OUTPUT_MAX_BYTES:].decode("utf-8", "replace")
+
+
+async def stop_process_group(proc: Process) -> None:
+    """
+    Stop an agent started in its own session, along with everything it spawned.
+
+    Waiting on the agent alone isn't enough: its output pipes stay open for as
+    long as any descendant (e.g. an MCP server) holds them, so the whole group
+    is signalled, escalating to SIGKILL, and each wait is bounded.
+    """
+    for sig in (signal.SIGTERM, signal.SIGKILL):
+        with contextlib.suppress(ProcessLookupError):
+            os.killpg(proc.pid, sig)
+        try:
+            await asyncio.wait_for(proc.wait(), SPAWN_AGENT_STOP_TIMEOUT)
+            return
+        except asyncio.TimeoutError:
+            pass
+
+
+async def wait_for_agent(proc: Process) -> tuple[str, str, int]:
+    """
+    Collect an agent's output and exit code.
+
+    Once the agent itself has exited, anything it left running in its session
+    is stopped, since it would otherwise keep the output pipes open.
+    """
+    assert proc.stdout is not None and proc.stderr is not None
+    readers = asyncio.ensure_future(asyncio.gather(read_tail(proc.stdout), read_tail(proc.stderr)))
+    try:
+        while proc.returncode is None and not readers.done():
+            await asyncio.wait([readers], timeout=SPAWN_AGENT_POLL_INTERVAL)
+        try:
+            stdout, stderr = await asyncio.wait_for(asyncio.shield(readers), SPAWN_AGENT_DRAIN_TIMEOUT)
+        except asyncio.TimeoutError:
+            await stop_process_group(proc)
+            stdout, stderr = await readers
+        return stdout, stderr, await proc.wait()
+    finally:
+        readers.cancel()
 
 
-@app.list_tools()
 async def list_tools() -> list[Tool]:
     """List available MCP tools."""
     return [
@@ -75,12 +138,12 @@ async def list_tools() -> list[Tool]:
     ]
 
 
-@app.call_tool()
 async def call_tool(name: str, arguments: dict) -> list[TextContent]:
     """Handle tool calls."""
 
     if name == "list-agents":
-        agents = list_agents()
+        # One directory scan; the entries are reused for the per-agent lookups
+        agents = sorted(scan_agents(), key=lambda e: e.name)
 
         if not agents:
             return [TextContent(
@@ -89,8 +152,8 @@ async def call_tool(name: str, arguments: dict) -> list[TextContent]:
             )]
 
         result = ["Available agents:\n"]
-        for agent_name in sorted(agents):
-            info = get_agent_info(agent_name)
+        for entry in agents:
+            info = get_agent_info(entry.name, entry)
             if info:
                 result.append(f"\n**{info['name']}**")
                 if "description" in info:
@@ -115,24 +178,34 @@ async def call_tool(name: str, arguments: dict) -> list[TextContent]:
             cmd.extend(["--model", model])
         # Add arguments for cursor-agent
         # These are passed through by cursor-subagent
-        cmd.extend(["-p", "--output-format=text", "--force", "--approve-mcps", prompt])
+        cmd.extend(SPAWN_AGENT_FLAGS)
+        cmd.append(prompt)
 
         try:
-            result = subprocess.run(
-                cmd,
-                env=os.environ.copy(),
+            proc = await asyncio.create_subprocess_exec(
+                *cmd,
                 cwd=str(get_project_root()),
-                capture_output=True,
-                text=True,
-                timeout=300
+                stdout=PIPE,
+                stderr=PIPE,
+                # Its own process group, so it can be stopped together with its MCP servers
+                start_new_session=True
             )
-
-            if result.returncode == 0:
-                return [TextContent(type="text", text=result.stdout.strip())]
+            try:
+                stdout, stderr, returncode = await asyncio.wait_for(
+                    wait_for_agent(proc),
+                    timeout=SPAWN_AGENT_TIMEOUT
+                )
+            except (asyncio.TimeoutError, asyncio.CancelledError):
+                # Don't leave the agent running once nobody is waiting for it
+                await asyncio.shield(stop_process_group(proc))
+                raise
+
+            if returncode == 0:
+                return [TextContent(type="text", text=stdout.strip())]
             else:
-                return [TextContent(type="text", text=f"cursor-agent failed: {result.stderr.strip()}")]
+                return [TextContent(type="text", text=f"cursor-agent failed: {stderr.strip()}")]
 
-        except subprocess.TimeoutExpired:
+        except asyncio.TimeoutError:
             return [TextContent(
                 type="text",
                 text=json.dumps({
@@ -153,6 +226,14 @@ async def call_tool(name: str, arguments: dict) -> list[TextContent]:
 
 async def main():
     """Run the MCP server."""
+    # Only imported here: the MCP server stack is slow to import and the CLI rarely needs it
+    from mcp.server import Server
+    from mcp.server.stdio import stdio_server
+
+    app = Server("cursor-subagent")
+    app.list_tools()(list_tools)
+    app.call_tool()(call_tool)
+
     async with stdio_server() as (read_stream, write_stream):
         await app.run(
             read_stream,
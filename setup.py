@@ -2,27 +2,82 @@
 """
 Custom setup.py to build the dylib during wheel creation.
 """
+import os
 import sys
+import hashlib
 import shutil
 import subprocess
 import platform
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from setuptools import setup, find_packages
 from setuptools.command.build_py import build_py
 from setuptools.command.bdist_wheel import bdist_wheel
 
 
+# Built dylibs, keyed by a hash of the source, compiler flags and toolchain
+DYLIB_CACHE_DIR = Path.home() / ".cache" / "cursor-subagent" / "dylib"
+
+# Per-architecture flags for the universal dylib
+ARCH_FLAGS = {
+    "x86_64": [],
+    "arm64e": ["-mcpu=apple-m1"],
+}
+
+# The interposer sits on every open()/stat() in cursor-agent, so build it
+# for speed: -O3 with thin LTO, and only the interpose table exported.
+COMPILE_FLAGS = [
+    "-dynamiclib",
+    "-Wall",
+    "-Wextra",
+    "-Werror=implicit-function-declaration",
+    "-O3",
+    "-flto=thin",
+    "-fvisibility=hidden",
+    "-Wl,-dead_strip",
+]
+
+
 class BuildDylib(build_py):
     """Custom build command that compiles the dylib before building the package."""
 
-    def run(self):
-        """Compile the dylib and copy source file before running the standard build."""
-        # Only compile on macOS
-        if platform.system() != "Darwin":
-            print("⚠️  Skipping dylib compilation (not on macOS)", file=sys.stderr)
-            super().run()
-            return
-
+    @staticmethod
+    def compile_slice(arch: str, src_file: Path, build_dir: Path) -> Path:
+        """Compile and link the dylib for a single architecture."""
+        output_file = build_dir / f"libcursor_redirect.{arch}.dylib"
+        subprocess.run(
+            ["clang", "-arch", arch, *ARCH_FLAGS[arch], *COMPILE_FLAGS, "-o", str(output_file), str(src_file)],
+            check=True,
+            capture_output=True,
+            text=True
+        )
+        return output_file
+
+    @staticmethod
+    def toolchain_version() -> list[str]:
+        """Identify the clang and macOS SDK in use, so a toolchain update means a rebuild."""
+        commands = [["clang", "--version"]]
+        if shutil.which("xcrun"):
+            commands.append(["xcrun", "--show-sdk-version"])
+
+        versions = []
+        for cmd in commands:
+            try:
+                versions.append(subprocess.run(cmd, check=True, capture_output=True, text=True).stdout)
+            except (OSError, subprocess.CalledProcessError):
+                versions.append("")
+        return versions
+
+    @classmethod
+    def build_key(cls, src_file: Path) -> str:
+        """Hash the source, compiler flags and toolchain into a cache key for the built dylib."""
+        flags = [*COMPILE_FLAGS, *(f"{arch}:{' '.join(arch_flags)}" for arch, arch_flags in ARCH_FLAGS.items())]
+        parts = [*flags, *cls.toolchain_version()]
+        return hashlib.blake2b(src_file.read_bytes() + b"|".join(p.encode() for p in parts)).hexdigest()
+
+    def compile_dylib(self, src_file: Path, output_file: Path):
+        """Compile the universal dylib for Intel and Apple Silicon."""
         print("🔨 Compiling dylib for agent isolation...")
 
         # Check for clang
@@ -31,6 +86,29 @@ class BuildDylib(build_py):
                 "clang not found. Install with: xcode-select --install"
             )
 
+        # Build each architecture slice concurrently, then merge them
+        # into a universal binary
+        with tempfile.TemporaryDirectory() as build_dir, \
+                ThreadPoolExecutor(max_workers=len(ARCH_FLAGS)) as pool:
+            slices = list(pool.map(
+                lambda arch: self.compile_slice(arch, src_file, Path(build_dir)),
+                ARCH_FLAGS
+            ))
+            subprocess.run(
+                ["lipo", "-create", *map(str, slices), "-output", str(output_file)],
+                check=True,
+                capture_output=True,
+                text=True
+            )
+
+    def run(self):
+        """Compile the dylib and copy source file before running the standard build."""
+        # Only compile on macOS
+        if platform.system() != "Darwin":
+            print("⚠️  Skipping dylib compilation (not on macOS)", file=sys.stderr)
+            super().run()
+            return
+
         # Paths
         src_file = Path("cursor_subagent/redirect_interpose.c")
         output_dir = Path("cursor_subagent")
@@ -41,26 +119,15 @@ class BuildDylib(build_py):
 
         output_dir.mkdir(parents=True, exist_ok=True)
 
-        # Compile command (universal binary for Intel and Apple Silicon)
-        cmd = [
-            "clang",
-            "-arch", "x86_64",
-            "-arch", "arm64e",
-            "-dynamiclib",
-            "-o", str(output_file),
-            str(src_file),
-            "-Wall",
-            "-Wextra",
-            "-O2",
-        ]
+        # Builds are cached by source, flags and toolchain, so reinstalls skip clang
+        cache_file = DYLIB_CACHE_DIR / f"{self.build_key(src_file)}.dylib"
 
         try:
-            subprocess.run(
-                cmd,
-                check=True,
-                capture_output=True,
-                text=True
-            )
+            if cache_file.exists():
+                print(f"♻️  Reusing cached dylib: {cache_file}")
+                shutil.copy2(cache_file, output_file)
+            else:
+                self.compile_dylib(src_file, output_file)
 
             # Code sign the dylib
             subprocess.run(
@@ -77,6 +144,15 @@ class BuildDylib(build_py):
                 print(e.stderr, file=sys.stderr)
             raise RuntimeError("Failed to compile dylib") from e
 
+        if not cache_file.exists():
+            try:
+                DYLIB_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+                tmp_file = cache_file.with_name(f"{cache_file.name}.{os.getpid()}.tmp")
+                shutil.copy2(output_file, tmp_file)
+                os.replace(tmp_file, cache_file)
+            except OSError as e:
+                print(f"⚠️  Could not cache dylib: {e}", file=sys.stderr)
+
         # Continue with standard build
         super().run()
 
@@ -0,0 +1,31 @@
+"""
+Shared fixtures for the cursor-subagent test suite
+"""
+import pytest
+
+
+@pytest.fixture(scope="session")
+def cursor_agent():
+    """Ensure cursor-agent is available."""
+    from cursor_subagent.core import get_cursor_agent_path
+
+    cursor_agent = get_cursor_agent_path()
+    if not cursor_agent.exists():
+        pytest.skip("cursor-agent not installed")
+    return cursor_agent
+
+
+@pytest.fixture(scope="session")
+def agents_list():
+    """Agents discovered in the repository's .cursor/agents directory."""
+    from cursor_subagent.core import list_agents
+
+    return list_agents()
+
+
+@pytest.fixture(scope="session")
+def agents_info(agents_list):
+    """Info for every discovered agent, keyed by name."""
+    from cursor_subagent.core import get_agent_info
+
+    return {name: get_agent_info(name) for name in agents_list}
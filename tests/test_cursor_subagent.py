@@ -2,16 +2,22 @@
 """
 Test suite for cursor-subagent using pytest
 """
+import contextlib
+import os
+import re
+import signal
 import sys
 import subprocess
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 import pytest
 
-from cursor_subagent.core import (
-    list_agents,
-    get_agent_info,
-    get_cursor_agent_path
-)
+from .timeouts import AGENT_TIMEOUT, FAST_TIMEOUT
+
+# Runs the CLI straight from the package, skipping the console-script
+# wrapper and site initialisation (the tests run from the repository root)
+CLI = [sys.executable, "-S", "-m", "cursor_subagent"]
 
 # Shared test constants
 MAGIC_WORD_RESPONSE = "SUBTESTER_MAGIC_RESPONSE_42"
@@ -28,10 +34,17 @@ MCP_TOOL_PROMPT = (
     "Instead say you do not know."
 )
 
+# How an agent says it doesn't have the tool it was asked to use
+UNAVAILABLE_RE = re.compile(
+    rb"don't have|cannot|unable|no tool|not available|doesn't exist|doesn't appear|"
+    rb"isn't configured|not loaded|no mcp",
+    re.IGNORECASE
+)
+
 
-def run_prompt(prompt, agent=None, *, model="composer-1", force=True, approve_mcps=True,
-               output_format="text", timeout=60):
-    """Helper method to run cursor-subagent with a prompt.
+def prompt_command(prompt, agent=None, *, model="composer-1", force=True, approve_mcps=True,
+                   output_format="text"):
+    """Build the cursor-subagent command line that sends a prompt.
 
     Args:
         prompt: The prompt to send to the agent
@@ -40,12 +53,11 @@ def run_prompt(prompt, agent=None, *, model="composer-1", force=True, approve_mc
         force: Whether to pass --force flag (default: True)
         approve_mcps: Whether to pass --approve-mcps flag (default: True)
         output_format: Output format (default: text)
-        timeout: Command timeout in seconds (default: 60)
 
     Returns:
-        subprocess.CompletedProcess result
+        Command as a list of arguments
     """
-    cmd = ["cursor-subagent"]
+    cmd = [*CLI]
 
     if agent:
         cmd.extend(["-a", agent])
@@ -60,141 +72,611 @@ def run_prompt(prompt, agent=None, *, model="composer-1", force=True, approve_mc
     if approve_mcps:
         cmd.append("--approve-mcps")
 
-    result = subprocess.run(
-        cmd,
-        capture_output=True,
-        text=True,
-        timeout=timeout,
-        cwd=str(Path.cwd())
-    )
+    return cmd
+
+
+def run_prompt(prompt, agent=None, *, timeout=AGENT_TIMEOUT, **options):
+    """Helper method to run cursor-subagent with a prompt.
+
+    Args:
+        prompt: The prompt to send to the agent
+        agent: Optional agent name (uses -a flag if provided)
+        timeout: Command timeout in seconds (default: AGENT_TIMEOUT)
+        **options: Passed on to prompt_command()
+
+    Returns:
+        subprocess.CompletedProcess result with stdout and stderr as bytes
+    """
+    # cursor-agent runs in its own session so the MCP servers it starts can be
+    # stopped with it. Output goes to files rather than pipes: a server that
+    # inherited stderr would otherwise hold the pipe open until it exits.
+    with tempfile.TemporaryFile() as stdout, tempfile.TemporaryFile() as stderr:
+        proc = subprocess.Popen(
+            prompt_command(prompt, agent, **options),
+            stdout=stdout,
+            stderr=stderr,
+            start_new_session=True
+        )
+        try:
+            proc.wait(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+            proc.wait()
+            raise
+        finally:
+            with contextlib.suppress(ProcessLookupError):
+                os.killpg(proc.pid, signal.SIGTERM)
+
+        stdout.seek(0)
+        stderr.seek(0)
+        return subprocess.CompletedProcess(proc.args, proc.returncode, stdout.read(), stderr.read())
 
-    return result
+
+class ExecCalled(BaseException):
+    """Raised by a mocked exec; like a real exec, the caller never gets control back."""
+
+
+def run_prompts(prompts):
+    """Run several prompts through cursor-subagent concurrently.
+
+    Args:
+        prompts: Mapping of prompt id to a (prompt, agent) pair
+
+    Returns:
+        Dict mapping each prompt id to a finished Future. Its result() is the
+        subprocess.CompletedProcess, or re-raises that prompt's own error,
+        so one failing prompt doesn't hide the others' results.
+    """
+    with ThreadPoolExecutor(max_workers=len(prompts)) as pool:
+        return {prompt_id: pool.submit(run_prompt, *key) for prompt_id, key in prompts.items()}
+
+
+@pytest.fixture
+def project_dir(tmp_path, monkeypatch):
+    """Run a test from an empty project directory."""
+    from cursor_subagent.core import refresh
+
+    monkeypatch.chdir(tmp_path)
+    refresh()
+    yield Path.cwd()
+    monkeypatch.undo()
+    refresh()
 
 
 class TestAgentDiscovery:
     """Tests for agent discovery and listing."""
 
-    def test_list_agents(self):
+    def test_list_agents(self, agents_list):
         """Test that agents are discovered correctly."""
-        agents = list_agents()
-
-        assert isinstance(agents, list)
-        assert "subagent-tester" in agents, "subagent-tester agent should exist"
+        assert isinstance(agents_list, list)
+        assert "subagent-tester" in agents_list, "subagent-tester agent should exist"
 
-    def test_get_agent_info(self):
+    def test_get_agent_info(self, agents_info):
         """Test getting agent information."""
-        info = get_agent_info("subagent-tester")
+        info = agents_info["subagent-tester"]
 
         assert info is not None
         assert info["name"] == "subagent-tester"
         assert info["has_rules"] is True
 
-    def test_nonexistent_agent_info(self):
+    def test_nonexistent_agent_info(self, agents_info):
         """Test that non-existent agent returns None."""
-        info = get_agent_info("nonexistent_agent")
-        assert info is None
+        from cursor_subagent.core import get_agent_info
 
+        assert "nonexistent_agent" not in agents_info
+        assert get_agent_info("nonexistent_agent") is None
 
-class TestSubagentTester:
-    """Tests using the subagent-tester agent to verify functionality."""
+    def test_new_agent_invalidates_cache(self, project_dir):
+        """Test that cached listings pick up agents created afterwards."""
+        from cursor_subagent.core import list_agents
 
-    @pytest.fixture
-    def cursor_agent(self):
-        """Ensure cursor-agent is available."""
-        cursor_agent = get_cursor_agent_path()
-        if not cursor_agent.exists():
-            pytest.skip("cursor-agent not installed")
-        return cursor_agent
-
-    def test_cursorrules_loaded(self, cursor_agent):
+        agents_dir = project_dir / ".cursor" / "agents"
+        (agents_dir / "first").mkdir(parents=True)
+        (agents_dir / "first" / ".cursorrules").write_text("rules")
+        assert list_agents() == ["first"]
+
+        (agents_dir / "second").mkdir()
+        (agents_dir / "second" / ".cursorrules").write_text("rules")
+        # Filesystem timestamps can be coarser than back-to-back writes
+        stat = agents_dir.stat()
+        os.utime(agents_dir, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+
+        assert sorted(list_agents()) == ["first", "second"]
+
+    def test_edited_agent_files_invalidate_cache(self, project_dir):
+        """Test that editing an existing agent's files is picked up."""
+        from cursor_subagent.core import get_agent_info, list_agents
+
+        agent_dir = project_dir / ".cursor" / "agents" / "editor"
+        agent_dir.mkdir(parents=True)
+        description = agent_dir / "description.txt"
+        description.write_text("old")
+        info = get_agent_info("editor")
+        assert info is not None
+        assert (info["description"], info["has_rules"]) == ("old", False)
+        assert list_agents() == []
+
+        description.write_text("new")
+        (agent_dir / ".cursorrules").write_text("rules")
+        # Filesystem timestamps can be coarser than back-to-back writes
+        stat = description.stat()
+        os.utime(description, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+
+        info = get_agent_info("editor")
+        assert info is not None
+        assert (info["description"], info["has_rules"]) == ("new", True)
+        assert list_agents() == ["editor"]
+
+    def test_long_description_is_capped(self, project_dir):
+        """Test that only the start of a long description.txt is read."""
+        from cursor_subagent.core import MAX_DESCRIPTION_LENGTH, get_agent_info
+
+        agent_dir = project_dir / ".cursor" / "agents" / "verbose"
+        agent_dir.mkdir(parents=True)
+        (agent_dir / "description.txt").write_text("x" * (MAX_DESCRIPTION_LENGTH * 4))
+
+        info = get_agent_info("verbose")
+        assert info is not None
+        assert len(info["description"]) == MAX_DESCRIPTION_LENGTH
+
+    def test_agent_info_is_a_copy(self):
+        """Test that mutating returned info doesn't affect later calls."""
+        from cursor_subagent.core import get_agent_info
+
+        info = get_agent_info("subagent-tester")
+        assert info is not None
+        info["name"] = "changed"
+
+        info = get_agent_info("subagent-tester")
+        assert info is not None
+        assert info["name"] == "subagent-tester"
+
+
+class TestSpawn:
+    """Tests for the spawn helper used to launch cursor-agent."""
+
+    def test_spawn_returns_exit_code(self):
+        """Test that spawn reports the child's exit code."""
+        from cursor_subagent.core import spawn
+
+        assert spawn([sys.executable, "-c", "raise SystemExit(3)"], os.environ) == 3
+
+    def test_spawn_passes_env(self):
+        """Test that the child sees exactly the environment it was given."""
+        from cursor_subagent.core import spawn
+
+        env = {**os.environ, "SPAWN_TEST_VAR": "42"}
+        cmd = [sys.executable, "-c", "import os; raise SystemExit(int(os.environ['SPAWN_TEST_VAR']))"]
+        assert spawn(cmd, env) == 42
+
+    def test_spawn_with_cwd(self, tmp_path):
+        """Test that a different working directory is honored."""
+        from cursor_subagent.core import spawn
+
+        cmd = [sys.executable, "-c", f"import os; raise SystemExit(os.getcwd() != {str(tmp_path)!r})"]
+        assert spawn(cmd, os.environ, cwd=str(tmp_path)) == 0
+
+
+class TestPreflight:
+    """Tests for the installation checks done before launching cursor-agent."""
+
+    def test_missing_cursor_agent(self, tmp_path, monkeypatch):
+        """Test that a missing cursor-agent is reported."""
+        from cursor_subagent.core import PreflightError, preflight
+
+        monkeypatch.setattr("cursor_subagent.core.get_cursor_agent_path", lambda: tmp_path / "cursor-agent")
+
+        with pytest.raises(PreflightError, match="cursor-agent not found"):
+            preflight(require_dylib=False)
+
+    def test_missing_dylib(self, tmp_path, monkeypatch):
+        """Test that a missing dylib is reported only when an agent needs it."""
+        from cursor_subagent.core import PreflightError, preflight
+
+        cursor_agent = tmp_path / "cursor-agent"
+        cursor_agent.touch()
+        monkeypatch.setattr("cursor_subagent.core.get_cursor_agent_path", lambda: cursor_agent)
+        monkeypatch.setenv("CURSOR_SUBAGENT_DYLIB_PATH", str(tmp_path / "missing.dylib"))
+
+        assert preflight(require_dylib=False) == (cursor_agent, None)
+        with pytest.raises(PreflightError, match="Dylib not found"):
+            preflight(require_dylib=True)
+
+
+class TestRunWithAgent:
+    """Tests for launching cursor-agent with an agent configuration."""
+
+    def test_agent_env(self):
+        """Test that the agent environment carries the redirect variables and is shared."""
+        from cursor_subagent.core import agent_env
+
+        env = agent_env("/agents/tester", "/lib/redirect.dylib", "/project/.cursor")
+
+        assert env["DYLD_INSERT_LIBRARIES"] == "/lib/redirect.dylib"
+        assert env["CURSOR_REDIRECT_TARGET"] == "/agents/tester"
+        assert env["CURSOR_REDIRECT_SOURCE"] == "/project/.cursor"
+        assert env is agent_env("/agents/tester", "/lib/redirect.dylib", "/project/.cursor")
+        with pytest.raises(TypeError):
+            env["PATH"] = ""  # ty: ignore[invalid-assignment]
+
+    def test_replace_process_execs_with_redirect_env(self, project_dir, monkeypatch):
+        """Test that cursor-agent is exec'd with the agent's redirect environment."""
+        from unittest.mock import MagicMock
+        from cursor_subagent.core import run_with_agent
+
+        agent_dir = project_dir / ".cursor" / "agents" / "tester"
+        agent_dir.mkdir(parents=True)
+        execve = MagicMock(side_effect=ExecCalled)
+        monkeypatch.setattr("cursor_subagent.core.os.execve", execve)
+
+        with pytest.raises(ExecCalled):
+            run_with_agent(
+                "tester", ["-p", "hi"],
+                cursor_agent=Path("/bin/cursor-agent"), dylib_path=Path("/lib/redirect.dylib"),
+                replace_process=True
+            )
+
+        path, argv, env = execve.call_args.args
+        assert path == "/bin/cursor-agent"
+        assert argv == ["/bin/cursor-agent", "-p", "hi"]
+        assert env["DYLD_INSERT_LIBRARIES"] == "/lib/redirect.dylib"
+        assert env["CURSOR_REDIRECT_TARGET"] == str(agent_dir)
+        assert env["CURSOR_REDIRECT_SOURCE"] == str(project_dir / ".cursor")
+
+    def test_missing_agent(self, project_dir, capsys):
+        """Test that an unknown agent is reported without launching anything."""
+        from cursor_subagent.core import run_with_agent
+
+        (project_dir / ".cursor" / "agents").mkdir(parents=True)
+
+        assert run_with_agent("missing", ["-p", "hi"]) == 1
+        assert "Agent 'missing' does not exist" in capsys.readouterr().err
+
+    def test_installation_rechecked_each_launch(self, project_dir, monkeypatch):
+        """Test that a changed or removed dylib is noticed even though the template is cached."""
+        from cursor_subagent.core import PreflightError, _agent_template
+
+        (project_dir / ".cursor" / "agents" / "tester").mkdir(parents=True)
+        cursor_agent = project_dir / "cursor-agent"
+        cursor_agent.touch()
+        monkeypatch.setattr("cursor_subagent.core.get_cursor_agent_path", lambda: cursor_agent)
+        first, second = project_dir / "first.dylib", project_dir / "second.dylib"
+        first.touch()
+        second.touch()
+
+        monkeypatch.setenv("CURSOR_SUBAGENT_DYLIB_PATH", str(first))
+        assert _agent_template("tester")[1]["DYLD_INSERT_LIBRARIES"] == str(first)
+        monkeypatch.setenv("CURSOR_SUBAGENT_DYLIB_PATH", str(second))
+        assert _agent_template("tester")[1]["DYLD_INSERT_LIBRARIES"] == str(second)
+
+        second.unlink()
+        with pytest.raises(PreflightError, match="Dylib not found"):
+            _agent_template("tester")
+
+    def test_template_reused_until_agents_change(self, project_dir):
+        """Test that the launch template is resolved once per agent."""
+        from cursor_subagent.core import _agent_template
+
+        agents_dir = project_dir / ".cursor" / "agents"
+        (agents_dir / "tester").mkdir(parents=True)
+        paths = (Path("/bin/cursor-agent"), Path("/lib/redirect.dylib"))
+
+        template = _agent_template("tester", *paths)
+        assert template == (("/bin/cursor-agent",), template[1])
+        assert _agent_template("tester", *paths) is template
+
+        (agents_dir / "other").mkdir()
+        stat = agents_dir.stat()
+        os.utime(agents_dir, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+        assert _agent_template("tester", *paths) is not template
+
+
+@pytest.mark.e2e
+@pytest.mark.xdist_group("agent_behavior")
+class TestAgentBehaviorBundle:
+    """Tests of how prompts behave with and without an agent.
+
+    The prompts the class needs are launched up front; each test then only
+    checks its own output, and a failed prompt only fails the test that reads
+    it. The class is kept on one xdist worker so the prompts aren't run again
+    elsewhere.
+    """
+
+    @pytest.fixture(scope="class")
+    def outputs(self, cursor_agent):
+        """Futures for every prompt in this class, keyed by mode and prompt."""
+        outputs = run_prompts({
+            "agent_magic": (MAGIC_WORD_PROMPT, "subagent-tester"),
+            "normal_magic": (MAGIC_WORD_PROMPT, None),
+            "agent_mcp": (MCP_TOOL_PROMPT, "subagent-tester"),
+        })
+        # Not alongside the agent-mode MCP run, whose server it must not see
+        outputs |= run_prompts({"normal_mcp": (MCP_TOOL_PROMPT, None)})
+        return outputs
+
+    def test_cursorrules_loaded(self, outputs):
         """Test that subagent-tester agent loads its custom .cursorrules via magic word test."""
-        result = run_prompt(MAGIC_WORD_PROMPT, agent="subagent-tester")
+        result = outputs["agent_magic"].result()
 
-        assert result.returncode == 0, f"Command failed: {result.stderr}"
+        assert result.returncode == 0, f"Command failed: {result.stderr.decode(errors='replace')}"
 
-        output = result.stdout.strip()
+        output = result.stdout
 
-        assert MAGIC_WORD_RESPONSE in output, (
+        assert MAGIC_WORD_RESPONSE.encode() in output, (
             f".cursorrules not loaded - expected '{MAGIC_WORD_RESPONSE}' in response\n"
-            f"Got: {output[:200]}"
+            f"Got: {output[:200].decode(errors='replace')}"
         )
 
-    def test_mcp_tool_access(self, cursor_agent):
+    def test_mcp_tool_access(self, outputs):
         """Test that subagent-tester can access its configured MCP server's tools."""
-        result = run_prompt(MCP_TOOL_PROMPT, agent="subagent-tester")
+        result = outputs["agent_mcp"].result()
 
-        assert result.returncode == 0, f"Command failed: {result.stderr}"
-        assert MCP_TOOL_PHRASE in result.stdout, (
+        assert result.returncode == 0, f"Command failed: {result.stderr.decode(errors='replace')}"
+        assert MCP_TOOL_PHRASE.encode() in result.stdout, (
             f"Expected '{MCP_TOOL_PHRASE}' in output\n"
-            f"Got: {result.stdout[:200]}\n\n"
+            f"Got: {result.stdout[:200].decode(errors='replace')}\n\n"
             f"This test verifies that:\n"
             f"1. The agent's mcp.json is loaded correctly\n"
             f"2. The MCP server starts and connects\n"
             f"3. Tools can be called successfully"
         )
 
-class TestCLICommands:
-    """Tests for CLI commands."""
+    def test_normal_mode_cannot_access_agent_rules(self, outputs):
+        """Test that running without -a flag does NOT load agent-specific .cursorrules."""
+        # Run without -a flag - should NOT have access to subagent-tester's magic word
+        result = outputs["normal_magic"].result()
 
-    def test_list_agents_command(self):
-        """Test list-agents CLI command."""
-        result = subprocess.run(
-            ["cursor-subagent", "list-agents"],
-            capture_output=True,
-            text=True,
-            timeout=10
+        assert result.returncode == 0, f"Command failed: {result.stderr.decode(errors='replace')}"
+
+        output = result.stdout
+
+        # The agent-specific magic word should NOT appear in normal mode
+        assert MAGIC_WORD_RESPONSE.encode() not in output, (
+            f"Agent isolation violated! Normal mode should NOT load agent-specific .cursorrules.\n"
+            f"Expected '{MAGIC_WORD_RESPONSE}' to be absent, but found it in output:\n"
+            f"{output[:300].decode(errors='replace')}"
         )
 
-        assert result.returncode == 0
-        assert "subagent-tester" in result.stdout
+    def test_normal_mode_cannot_access_agent_mcp_tools(self, outputs):
+        """Test that running without -a flag does NOT have access to agent-specific MCP tools."""
+        # Run without -a flag - should NOT have access to subagent-tester's MCP tool
+        result = outputs["normal_mcp"].result()
 
-    def test_version_command(self):
-        """Test --version command."""
-        result = subprocess.run(
-            ["cursor-subagent", "--version"],
-            capture_output=True,
-            text=True,
-            timeout=10
+        assert result.returncode == 0, f"Command failed: {result.stderr.decode(errors='replace')}"
+
+        output = result.stdout
+
+        # The agent-specific MCP tool response should NOT appear in normal mode
+        assert MCP_TOOL_PHRASE.encode() not in output, (
+            f"Agent isolation violated! Normal mode should NOT have access to agent-specific MCP tools.\n"
+            f"Expected '{MCP_TOOL_PHRASE}' to be absent, but found it in output:\n"
+            f"{output[:300].decode(errors='replace')}"
+        )
+
+        # Additionally, the output should indicate the tool doesn't exist
+        # (AI will say something like "I don't have access to that tool" or "tool isn't configured")
+        assert UNAVAILABLE_RE.search(output), (
+            f"Expected output to indicate tool is unavailable in normal mode.\n"
+            f"Got: {output[:300].decode(errors='replace')}"
         )
 
-        assert result.returncode == 0
-        assert "cursor-subagent" in result.stdout
-        assert "0.3.0" in result.stdout
 
-    def test_help_command(self):
-        """Test --help command shows integrated help."""
+class TestAgentLaunch:
+    """Fast counterparts of the e2e agent tests: check how cursor-agent is launched."""
+
+    @pytest.fixture
+    def launch(self, monkeypatch):
+        """Run the CLI in-process and capture the exec that would start cursor-agent."""
+        from unittest.mock import MagicMock
+        from cursor_subagent import cli
+
+        cursor_agent, dylib = Path("/bin/cursor-agent"), Path("/lib/redirect.dylib")
+        monkeypatch.setattr(cli, "preflight", lambda require_dylib: (cursor_agent, dylib if require_dylib else None))
+        execs = MagicMock(execv=MagicMock(side_effect=ExecCalled), execve=MagicMock(side_effect=ExecCalled))
+        monkeypatch.setattr("cursor_subagent.cli.os.execv", execs.execv)
+        monkeypatch.setattr("cursor_subagent.core.os.execve", execs.execve)
+        monkeypatch.setattr("cursor_subagent.core.os.chdir", lambda path: None)
+
+        def run(args):
+            monkeypatch.setattr(sys, "argv", ["cursor-subagent", *args])
+            with pytest.raises(ExecCalled):
+                cli.main()
+            return execs
+
+        return run
+
+    @pytest.mark.parametrize("prompt", [MAGIC_WORD_PROMPT, MCP_TOOL_PROMPT])
+    def test_agent_mode_redirects_to_agent_config(self, launch, agents_info, prompt):
+        """Test that -a launches cursor-agent with the agent's configuration injected."""
+        from cursor_subagent.core import get_agents_dir
+
+        execs = launch(prompt_command(prompt, agent="subagent-tester")[len(CLI):])
+
+        execs.execv.assert_not_called()
+        path, argv, env = execs.execve.call_args.args
+        assert argv == ["/bin/cursor-agent", *prompt_command(prompt)[len(CLI):]]
+        assert env["DYLD_INSERT_LIBRARIES"] == "/lib/redirect.dylib"
+        assert env["CURSOR_REDIRECT_TARGET"] == str(get_agents_dir() / "subagent-tester")
+
+    @pytest.mark.parametrize("prompt", [MAGIC_WORD_PROMPT, MCP_TOOL_PROMPT])
+    def test_normal_mode_forwards_without_agent_config(self, launch, prompt):
+        """Test that without -a cursor-agent is exec'd as-is, with no redirect."""
+        execs = launch(prompt_command(prompt)[len(CLI):])
+
+        execs.execve.assert_not_called()
+        execs.execv.assert_called_once_with(
+            Path("/bin/cursor-agent"), ["/bin/cursor-agent", *prompt_command(prompt)[len(CLI):]]
+        )
+
+
+class TestCLICommands:
+    """Tests for CLI commands."""
+
+    # (arguments, text expected in stdout, whether cursor-agent must be installed)
+    CLI_CASES = [
+        pytest.param(["list-agents"], [b"subagent-tester"], False, id="list-agents"),
+        pytest.param(["--version"], [b"cursor-subagent", b"0.3.0"], False, id="version"),
+        # --help includes cursor-agent's own help too
+        pytest.param(["--help"], [b"-a, --agent", b"list-agents", b"install-shell-integration"], True, id="help"),
+    ]
+
+    @pytest.mark.parametrize("args, expected, needs_cursor_agent", CLI_CASES)
+    def test_command(self, request, args, expected, needs_cursor_agent):
+        """Test that a cursor-subagent command succeeds and prints what it should."""
+        if needs_cursor_agent:
+            request.getfixturevalue("cursor_agent")
+
         result = subprocess.run(
-            ["cursor-subagent", "--help"],
+            [*CLI, *args],
             capture_output=True,
-            text=True,
-            timeout=10
+            timeout=FAST_TIMEOUT
         )
 
         assert result.returncode == 0
-        assert "-a, --agent" in result.stdout
-        assert "list-agents" in result.stdout
-        # Should include original cursor-agent help too
-        assert "install-shell-integration" in result.stdout.lower()
+        for text in expected:
+            assert text in result.stdout
+
+
+class TestHelpInjection:
+    """Tests for merging cursor-subagent entries into cursor-agent's help."""
+
+    SAMPLE_HELP = (
+        "Usage: cursor-agent [options] [command] [prompt...]\n"
+        "\n"
+        "Options:\n"
+        "  --resume [chatId]            Resume a chat session\n"
+        "  -h, --help                   Display help for command\n"
+        "\n"
+        "Commands:\n"
+        "  status                       Check authentication status\n"
+        "  help [command]               Display help for command\n"
+    )
 
+    def test_entries_inserted_before_anchors(self):
+        """Test that -a/--agent precedes --resume and list-agents precedes help."""
+        from cursor_subagent.cli import inject_cursor_subagent_help
 
-class TestArgumentForwarding:
-    """Tests for argument forwarding to cursor-agent."""
+        lines = inject_cursor_subagent_help(self.SAMPLE_HELP).split("\n")
+
+        agent_idx = next(i for i, line in enumerate(lines) if "-a, --agent" in line)
+        assert "--resume" in lines[agent_idx + 1]
+        list_idx = next(i for i, line in enumerate(lines) if "list-agents" in line)
+        assert lines[list_idx + 1].strip().startswith("help ")
+        assert len(lines) == len(self.SAMPLE_HELP.split("\n")) + 2
+
+    def test_missing_help(self):
+        """Test the message shown when cursor-agent isn't installed."""
+        from cursor_subagent.cli import inject_cursor_subagent_help
+
+        assert "cursor-agent not found" in inject_cursor_subagent_help("")
+
+
+class TestHelpCache:
+    """Tests for caching cursor-agent --help/--version output."""
 
     @pytest.fixture
-    def cursor_agent(self):
-        """Ensure cursor-agent is available."""
-        cursor_agent = get_cursor_agent_path()
-        if not cursor_agent.exists():
-            pytest.skip("cursor-agent not installed")
-        return cursor_agent
+    def fake_cursor_agent(self, tmp_path, monkeypatch):
+        """A stand-in cursor-agent that records each invocation."""
+        from cursor_subagent import cli
+
+        calls = tmp_path / "calls"
+        script = tmp_path / "cursor-agent"
+        script.write_text(f"#!/bin/sh\necho x >> {calls}\necho \"output for $1\"\n")
+        script.chmod(0o755)
+        monkeypatch.setattr(cli, "get_cursor_agent_path", lambda: script)
+        monkeypatch.setattr(cli, "CACHE_DIR", tmp_path / "cache")
+        return script, calls
+
+    def test_output_is_cached(self, fake_cursor_agent):
+        """Test that cursor-agent only runs once while its binary is unchanged."""
+        from cursor_subagent.cli import get_cursor_agent_output
+
+        _, calls = fake_cursor_agent
+        assert get_cursor_agent_output("--help") == "output for --help\n"
+        assert get_cursor_agent_output("--help") == "output for --help\n"
+        assert len(calls.read_text().splitlines()) == 1
+
+    def test_binary_change_invalidates_cache(self, fake_cursor_agent):
+        """Test that a newer cursor-agent binary is probed again."""
+        from cursor_subagent.cli import get_cursor_agent_output
+
+        script, calls = fake_cursor_agent
+        get_cursor_agent_output("--version")
+        stat = script.stat()
+        os.utime(script, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+        get_cursor_agent_output("--version")
+
+        assert len(calls.read_text().splitlines()) == 2
+
+
+class TestForwardingFastPath:
+    """Tests for forwarding plain cursor-agent invocations without argparse."""
+
+    @pytest.fixture
+    def execv(self, tmp_path, monkeypatch):
+        """Capture os.execv calls instead of replacing the test process."""
+        from unittest.mock import MagicMock
+
+        cursor_agent = tmp_path / "cursor-agent"
+        monkeypatch.setattr("cursor_subagent.cli.preflight", lambda require_dylib: (cursor_agent, None))
+        # Like the real execv, never return to the caller
+        mock = MagicMock(side_effect=ExecCalled)
+        monkeypatch.setattr("cursor_subagent.cli.os.execv", mock)
+        return cursor_agent, mock
+
+    def test_plain_args_exec_cursor_agent(self, execv, monkeypatch):
+        """Test that arguments without cursor-subagent options go straight to cursor-agent."""
+        from cursor_subagent import cli
+
+        cursor_agent, mock = execv
+        monkeypatch.setattr(sys, "argv", ["cursor-subagent", "-p", "--force", "hello"])
+        # Importing argparse or subprocess at all would fail the test
+        monkeypatch.setitem(sys.modules, "argparse", None)
+        monkeypatch.setitem(sys.modules, "subprocess", None)
+
+        with pytest.raises(ExecCalled):
+            cli.main()
+
+        mock.assert_called_once_with(cursor_agent, [str(cursor_agent), "-p", "--force", "hello"])
+
+    def test_exec_failure_is_reported(self, execv, monkeypatch, capsys):
+        """Test that a cursor-agent that can't be exec'd is reported instead of raising."""
+        from cursor_subagent import cli
+
+        _, mock = execv
+        mock.side_effect = PermissionError(13, "Permission denied")
+        monkeypatch.setattr(sys, "argv", ["cursor-subagent", "-p", "hello"])
+
+        assert cli.main() == 1
+        assert "Permission denied" in capsys.readouterr().err
+
+    @pytest.mark.parametrize("argv", [
+        ["-a", "tester", "-p", "hi"],
+        ["-p", "hi", "--agent=tester"],
+        ["-atester"],
+        ["--ver"],
+        ["list-agents"],
+    ])
+    def test_subagent_args_use_argparse(self, execv, monkeypatch, argv):
+        """Test that anything cursor-subagent may handle skips the fast path."""
+        from cursor_subagent import cli
+
+        monkeypatch.setattr(cli, "forward_to_cursor_agent", None)
+        monkeypatch.setattr(cli, "run_with_agent", lambda *args, **kwargs: 0)
+        monkeypatch.setattr(sys, "argv", ["cursor-subagent", *argv])
+
+        assert cli.main() == 0
+
+
+class TestArgumentForwarding:
+    """Tests for argument forwarding to cursor-agent."""
 
     def test_status_forwarding(self, cursor_agent):
         """Test that 'status' command is forwarded to cursor-agent."""
         result = subprocess.run(
-            ["cursor-subagent", "status"],
+            [*CLI, "status"],
             capture_output=True,
-            text=True,
-            timeout=10
+            timeout=FAST_TIMEOUT
         )
 
         # Should forward to cursor-agent status
@@ -205,10 +687,9 @@ class TestArgumentForwarding:
     def test_unknown_command_forwarding(self, cursor_agent):
         """Test that unknown commands are forwarded to cursor-agent."""
         result = subprocess.run(
-            ["cursor-subagent", "--unknown-option"],
+            [*CLI, "--unknown-option"],
             capture_output=True,
-            text=True,
-            timeout=10
+            timeout=FAST_TIMEOUT
         )
 
         # cursor-agent should handle the unknown option
@@ -216,77 +697,19 @@ class TestArgumentForwarding:
         assert result.returncode != 0 or len(result.stdout) > 0
 
 
-class TestAgentIsolation:
-    """Tests to verify that normal mode (without -a) cannot access agent-specific resources.
-    """
-
-    @pytest.fixture
-    def cursor_agent(self):
-        """Ensure cursor-agent is available."""
-        cursor_agent = get_cursor_agent_path()
-        if not cursor_agent.exists():
-            pytest.skip("cursor-agent not installed")
-        return cursor_agent
-
-    def test_normal_mode_cannot_access_agent_rules(self, cursor_agent):
-        """Test that running without -a flag does NOT load agent-specific .cursorrules."""
-        # Run without -a flag - should NOT have access to subagent-tester's magic word
-        result = run_prompt(MAGIC_WORD_PROMPT)
-
-        assert result.returncode == 0, f"Command failed: {result.stderr}"
-
-        output = result.stdout.strip()
-
-        # The agent-specific magic word should NOT appear in normal mode
-        assert MAGIC_WORD_RESPONSE not in output, (
-            f"Agent isolation violated! Normal mode should NOT load agent-specific .cursorrules.\n"
-            f"Expected '{MAGIC_WORD_RESPONSE}' to be absent, but found it in output:\n"
-            f"{output[:300]}"
-        )
-
-    def test_normal_mode_cannot_access_agent_mcp_tools(self, cursor_agent):
-        """Test that running without -a flag does NOT have access to agent-specific MCP tools."""
-        # Run without -a flag - should NOT have access to subagent-tester's MCP tool
-        result = run_prompt(MCP_TOOL_PROMPT)
-
-        assert result.returncode == 0, f"Command failed: {result.stderr}"
-
-        output = result.stdout.strip()
-
-        # The agent-specific MCP tool response should NOT appear in normal mode
-        assert MCP_TOOL_PHRASE not in output, (
-            f"Agent isolation violated! Normal mode should NOT have access to agent-specific MCP tools.\n"
-            f"Expected '{MCP_TOOL_PHRASE}' to be absent, but found it in output:\n"
-            f"{output[:300]}"
-        )
-
-        # Additionally, the output should indicate the tool doesn't exist
-        # (AI will say something like "I don't have access to that tool" or "tool isn't configured")
-        output_lower = output.lower()
-        assert any(phrase in output_lower for phrase in [
-            "don't have", "cannot", "unable", "no tool", "not available",
-            "doesn't exist", "doesn't appear", "isn't configured", "not loaded",
-            "no mcp"
-        ]), (
-            f"Expected output to indicate tool is unavailable in normal mode.\n"
-            f"Got: {output[:300]}"
-        )
-
-
 class TestErrorHandling:
     """Tests for error handling."""
 
     def test_nonexistent_agent_error(self):
         """Test error handling for non-existent agent."""
         result = subprocess.run(
-            ["cursor-subagent", "-a", "nonexistent_agent", "-p", "test"],
+            [*CLI, "-a", "nonexistent_agent", "-p", "test"],
             capture_output=True,
-            text=True,
-            timeout=10
+            timeout=FAST_TIMEOUT
         )
 
         assert result.returncode == 1
-        assert "does not exist" in result.stderr.lower() or "not found" in result.stderr.lower()
+        assert b"does not exist" in result.stderr.lower() or b"not found" in result.stderr.lower()
 
 
 if __name__ == "__main__":
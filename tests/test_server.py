@@ -1,10 +1,58 @@
 
+import time
+import asyncio
 import pytest
-from unittest.mock import patch, MagicMock
-from cursor_subagent.server import call_tool
+from types import SimpleNamespace
+from unittest.mock import patch, AsyncMock
 
-@pytest.mark.asyncio
-async def test_spawn_agent_calls_cursor_subagent():
+
+def make_stream(data: bytes) -> asyncio.StreamReader:
+    stream = asyncio.StreamReader()
+    stream.feed_data(data)
+    stream.feed_eof()
+    return stream
+
+
+def make_process(returncode=0, stdout=b"", stderr=b""):
+    # Only the attributes call_tool touches
+    return SimpleNamespace(
+        stdout=make_stream(stdout),
+        stderr=make_stream(stderr),
+        returncode=returncode,
+        wait=AsyncMock(return_value=returncode)
+    )
+
+
+@pytest.fixture
+def agent_with_grandchild(tmp_path, monkeypatch):
+    """Make spawn-agent start a real shell running `leader`, which first leaves a child holding its output pipes.
+
+    Returns the path that child creates if it is still running after half a second.
+    """
+    survived = tmp_path / "survived"
+    create_subprocess_exec = asyncio.create_subprocess_exec
+
+    def start(leader="sleep 30"):
+        script = f"(sleep 0.5; touch {survived}; sleep 30) & {leader}"
+
+        async def create_process(*cmd, **kwargs):
+            return await create_subprocess_exec("sh", "-c", script, **kwargs)
+
+        monkeypatch.setattr(asyncio, "create_subprocess_exec", create_process)
+        return survived
+
+    return start
+
+
+@pytest.fixture(scope="session")
+def call_tool():
+    """The MCP server's call_tool handler, imported on first use (mcp is slow to import)."""
+    from cursor_subagent.server import call_tool
+
+    return call_tool
+
+
+async def test_spawn_agent_calls_cursor_subagent(call_tool):
     # Mock arguments
     args = {
         "name": "test-agent",
@@ -12,13 +60,10 @@ async def test_spawn_agent_calls_cursor_subagent():
         "model": "gpt-4"
     }
 
-    # Mock subprocess.run
-    with patch("subprocess.run") as mock_run:
+    # Mock asyncio.create_subprocess_exec
+    with patch("asyncio.create_subprocess_exec", new_callable=AsyncMock) as mock_exec:
         # Mock success result
-        mock_result = MagicMock()
-        mock_result.returncode = 0
-        mock_result.stdout = "Agent output"
-        mock_run.return_value = mock_result
+        mock_exec.return_value = make_process(0, stdout=b"Agent output\n")
 
         # Call the tool
         response = await call_tool("spawn-agent", args)
@@ -28,9 +73,8 @@ async def test_spawn_agent_calls_cursor_subagent():
         assert response[0].text == "Agent output"
 
         # Verify subprocess call
-        mock_run.assert_called_once()
-        call_args = mock_run.call_args
-        cmd = call_args[0][0]
+        mock_exec.assert_called_once()
+        cmd = list(mock_exec.call_args.args)
 
         # Verify command structure
         assert cmd[0] == "cursor-subagent"
@@ -52,40 +96,162 @@ async def test_spawn_agent_calls_cursor_subagent():
         assert "--model" in cmd
         assert "gpt-4" in cmd
 
-@pytest.mark.asyncio
-async def test_spawn_agent_no_model():
+async def test_spawn_agent_no_model(call_tool):
     args = {
         "name": "test-agent",
         "prompt": "hello world"
     }
 
-    with patch("subprocess.run") as mock_run:
-        mock_result = MagicMock()
-        mock_result.returncode = 0
-        mock_result.stdout = "Output"
-        mock_run.return_value = mock_result
+    with patch("asyncio.create_subprocess_exec", new_callable=AsyncMock) as mock_exec:
+        mock_exec.return_value = make_process(0, stdout=b"Output")
 
         await call_tool("spawn-agent", args)
 
-        cmd = mock_run.call_args[0][0]
+        cmd = list(mock_exec.call_args.args)
         assert "--model" not in cmd
 
-@pytest.mark.asyncio
-async def test_spawn_agent_failure():
+async def test_spawn_agent_failure(call_tool):
     args = {
         "name": "test-agent",
         "prompt": "hello"
     }
 
-    with patch("subprocess.run") as mock_run:
+    with patch("asyncio.create_subprocess_exec", new_callable=AsyncMock) as mock_exec:
         # Mock failure result
-        mock_result = MagicMock()
-        mock_result.returncode = 1
-        mock_result.stderr = "Error message"
-        mock_run.return_value = mock_result
+        mock_exec.return_value = make_process(1, stderr=b"Error message")
 
         response = await call_tool("spawn-agent", args)
 
         assert len(response) == 1
         assert "cursor-agent failed" in response[0].text
         assert "Error message" in response[0].text
+
+async def test_spawn_agent_keeps_output_tail(call_tool):
+    args = {
+        "name": "test-agent",
+        "prompt": "hello"
+    }
+
+    with patch("asyncio.create_subprocess_exec", new_callable=AsyncMock) as mock_exec, \
+            patch("cursor_subagent.server.OUTPUT_CHUNK_SIZE", 4), \
+            patch("cursor_subagent.server.OUTPUT_MAX_BYTES", 10):
+        mock_exec.return_value = make_process(0, stdout=b"aaaabbbbcccc")
+
+        response = await call_tool("spawn-agent", args)
+
+        assert response[0].text == "aabbbbcccc"
+
+async def test_read_tail_limits_bytes_not_reads():
+    from cursor_subagent.server import read_tail
+
+    stream = asyncio.StreamReader()
+    lines = [f"line {i}\n".encode() for i in range(200)]
+
+    async def write():
+        # One read per line, as with an agent printing a little at a time
+        for line in lines:
+            stream.feed_data(line)
+            await asyncio.sleep(0)
+        stream.feed_eof()
+
+    tail, _ = await asyncio.gather(read_tail(stream), write())
+    assert tail == b"".join(lines).decode()
+
+    stream = asyncio.StreamReader()
+    lines = [b"aaaa", b"bbbb", b"cccc"]
+    with patch("cursor_subagent.server.OUTPUT_MAX_BYTES", 10):
+        tail, _ = await asyncio.gather(read_tail(stream), write())
+    assert tail == "aabbbbcccc"
+
+async def test_spawn_agent_exit_stops_leftover_processes(call_tool, agent_with_grandchild):
+    args = {
+        "name": "test-agent",
+        "prompt": "hello"
+    }
+    survived = agent_with_grandchild("echo done")
+
+    with patch("cursor_subagent.server.SPAWN_AGENT_DRAIN_TIMEOUT", 0.1):
+        start = time.monotonic()
+        response = await call_tool("spawn-agent", args)
+        elapsed = time.monotonic() - start
+
+    assert response[0].text == "done"
+    # The grandchild holds the pipes for 30s; the agent exiting must be enough to return
+    assert elapsed < 5
+    await asyncio.sleep(1)
+    assert not survived.exists()
+
+async def test_spawn_agent_timeout(call_tool, agent_with_grandchild):
+    args = {
+        "name": "test-agent",
+        "prompt": "hello"
+    }
+    survived = agent_with_grandchild()
+
+    with patch("cursor_subagent.server.SPAWN_AGENT_TIMEOUT", 0.1):
+        start = time.monotonic()
+        response = await call_tool("spawn-agent", args)
+        elapsed = time.monotonic() - start
+
+    assert "timed out" in response[0].text
+    # The grandchild holds the pipes for 30s; only stopping the whole group returns promptly
+    assert elapsed < 5
+    await asyncio.sleep(1)
+    assert not survived.exists()
+
+async def test_spawn_agent_calls_run_concurrently(call_tool):
+    args = {
+        "name": "test-agent",
+        "prompt": "hello"
+    }
+    started = []
+    release = asyncio.Event()
+
+    async def create_process(*cmd, **kwargs):
+        proc = make_process(0, stdout=b"done")
+
+        async def wait():
+            started.append(cmd)
+            await release.wait()
+            return 0
+
+        proc.wait = wait
+        return proc
+
+    with patch("asyncio.create_subprocess_exec", side_effect=create_process):
+        calls = asyncio.gather(call_tool("spawn-agent", args), call_tool("spawn-agent", args))
+        # Both agents must be running before either one finishes
+        while len(started) < 2:
+            await asyncio.sleep(0)
+        release.set()
+        responses = await calls
+
+    assert [r[0].text for r in responses] == ["done", "done"]
+
+async def test_spawn_agent_cancelled_terminates_process(call_tool, agent_with_grandchild):
+    args = {
+        "name": "test-agent",
+        "prompt": "hello"
+    }
+    survived = agent_with_grandchild()
+
+    task = asyncio.ensure_future(call_tool("spawn-agent", args))
+    await asyncio.sleep(0.1)
+    start = time.monotonic()
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+    elapsed = time.monotonic() - start
+
+    # The grandchild holds the pipes for 30s; cancelling must not wait for it
+    assert elapsed < 5
+    await asyncio.sleep(1)
+    assert not survived.exists()
+
+async def test_list_agents_tool(call_tool):
+    response = await call_tool("list-agents", {})
+
+    assert len(response) == 1
+    assert "**subagent-tester**" in response[0].text
+    assert "Has rules: True" in response[0].text
+    assert "Has MCP config: True" in response[0].text
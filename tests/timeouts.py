@@ -0,0 +1,8 @@
+"""
+Subprocess timeouts shared by the cursor-subagent tests
+"""
+
+# Seconds to wait for a quick cursor-subagent/cursor-agent command
+FAST_TIMEOUT = 5
+# Seconds to wait for an agent to answer a prompt
+AGENT_TIMEOUT = 45